@@ -0,0 +1,94 @@
+# gunicorn_conf.py
+#
+# Run with:  gunicorn --config gunicorn_conf.py webhook_server:app
+import os
+import sys
+import logging
+
+log = logging.getLogger("webhook")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# Handlers spend their time waiting on Hyperliquid HTTPS, so use threads.
+# Threads per worker default to HL_CCXT_WORKERS (webhook_server's exchange-call pool,
+# same default of 16): more would only queue on that pool and eat into the
+# per-stage timeouts. Set GUNICORN_THREADS only to override that on purpose.
+# GUNICORN_WORKER_CLASS=gevent switches to greenlets (needs `pip install gevent`).
+# The gevent worker monkey-patches in init_process(), which runs *after* the
+# post_fork hook; so post_fork below must not import the app under gevent, or
+# ccxt/requests/ssl and the module's locks and executor are built unpatched.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# Not one-per-core on purpose: the work is network-bound, and duplicate-alert
+# suppression plus the per-symbol order lock live in each worker's memory, so
+# every extra worker is another place a retried alert can land unserialized.
+# Nonces are per-worker too; pre_fork/post_fork below keep them disjoint.
+# Scale with GUNICORN_THREADS first.
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", os.getenv("HL_CCXT_WORKERS", "16")))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))  # gevent only
+timeout = 30
+
+# GUNICORN_PRELOAD=true imports the app and loads markets once in the master;
+# workers inherit them copy-on-write instead of each fetching their own.
+# Leave it off with gevent: the app would be imported before monkey-patching.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+# All workers sign with the same API wallet, whose nonces (ms timestamps) must
+# never repeat. Each live worker holds one slot and only issues nonces that are
+# congruent to it mod the stride. Leave headroom over `workers` for reloads/TTIN.
+_NONCE_STRIDE = int(os.getenv("HL_NONCE_STRIDE", str(max(16, 2 * workers))))
+
+
+def when_ready(server):
+    """With preload_app, build the ccxt client (markets) in the master before forking."""
+    if not server.cfg.preload_app:
+        return
+    try:
+        from webhook_server import ex
+        ex()
+    except Exception as e:
+        log.warning("Master prewarm failed: %s", e)
+
+
+def _is_gevent(server) -> bool:
+    # "gevent", "gevent_wsgi", "gunicorn.workers.ggevent.GeventWorker", ...
+    return "gevent" in server.cfg.worker_class_str.lower()
+
+
+def pre_fork(server, worker):
+    """(Master) give the new worker the lowest nonce slot no live worker holds."""
+    used = {getattr(w, "nonce_slot", None) for w in server.WORKERS.values()}
+    worker.nonce_slot = next((s for s in range(_NONCE_STRIDE) if s not in used), None)
+
+
+def _set_nonce_slot(worker):
+    slot = worker.nonce_slot
+    if slot is None:
+        log.error("Worker %s: no free nonce slot (HL_NONCE_STRIDE=%d); its nonces may "
+                  "collide with another worker's", worker.pid, _NONCE_STRIDE)
+        return
+    # Read at import; with preload_app the module is already loaded, so set it directly.
+    os.environ["HL_NONCE_SLOT"] = str(slot)
+    os.environ["HL_NONCE_STRIDE"] = str(_NONCE_STRIDE)
+    app_module = sys.modules.get("webhook_server")
+    if app_module is not None:
+        app_module.set_nonce_slot(slot, _NONCE_STRIDE)
+
+
+def post_fork(server, worker):
+    """
+    Warm the ccxt client before this worker accepts traffic, so the first
+    TradingView alert doesn't pay load_markets + DNS/TLS setup.
+    (With preload_app this just returns the inherited client.)
+    Skipped under gevent: the app must be imported after the worker's
+    monkey-patching, so the first request builds the client instead.
+    """
+    _set_nonce_slot(worker)
+    if _is_gevent(server):
+        return
+    try:
+        from webhook_server import ex
+        ex()
+    except Exception as e:
+        # Don't kill the worker: ex() retries lazily on the first request.
+        log.warning("Worker %s prewarm failed: %s", worker.pid, e)
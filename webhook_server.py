@@ -1,13 +1,76 @@
 # webhook_server.py
 import os
 import math
+import time
+import queue
+import atexit
 import logging
-from typing import Optional, Tuple, Dict, Any
-
+import logging.handlers
+import functools
+import stat
+import hashlib
+import tempfile
+import threading
+from decimal import Decimal
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, Dict, Any, List
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+import orjson
 import ccxt
-
-logging.basicConfig(level=logging.INFO)
+from eth_keys import keys as eth_keys
+
+# Request threads still format each record (QueueHandler.prepare, tracebacks
+# included) but only enqueue it; one listener thread does the stream writes, so
+# a burst of alerts doesn't serialize on the stdout lock.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_handler = logging.handlers.QueueHandler(_log_queue)
+_log_stream = logging.StreamHandler()
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
+_log_listener: Optional[logging.handlers.QueueListener] = None  # set only while running
+
+def _start_log_listener() -> None:
+    global _log_listener
+    _log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+    _log_listener.start()
+
+def _stop_log_listener() -> None:
+    """Flush what's queued and stop; a no-op if already stopped (e.g. by atexit)."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+    _log_listener = None
+
+# The listener thread doesn't survive fork (gunicorn preload). Drain and stop it
+# before forking; the child then gets its own empty queue (anything enqueued in
+# between stays the parent's to print) and each side restarts a listener only
+# if one was running.
+_log_restart_after_fork = False
+
+def _before_fork() -> None:
+    global _log_restart_after_fork
+    _log_restart_after_fork = _log_listener is not None
+    _stop_log_listener()
+
+def _after_fork_in_parent() -> None:
+    if _log_restart_after_fork:
+        _start_log_listener()
+
+def _after_fork_in_child_logging() -> None:
+    global _log_queue
+    _log_queue = _log_handler.queue = queue.SimpleQueue()
+    if _log_restart_after_fork:
+        _start_log_listener()
+
+_start_log_listener()
+atexit.register(_stop_log_listener)
+os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                    after_in_child=_after_fork_in_child_logging)
+# Werkzeug's per-request access lines (app.run only); gunicorn has its own accesslog
+logging.getLogger("werkzeug").setLevel(logging.WARNING)
 log = logging.getLogger("webhook")
 
 # ── ENV / CONFIG ─────────────────────────────────────────────────────────────────
@@ -18,24 +81,102 @@ NETWORK = os.getenv("HL_NETWORK", "testnet").lower()
 # Hyperliquid API wallet (EOA) address and its private key for signing
 API_WALLET   = (os.getenv("HL_API_WALLET") or "").strip()
 PRIVATE_KEY  = (os.getenv("HL_PRIVATE_KEY") or "").strip()
+# Env is read once at import, so the credential check is a constant too
+CREDENTIALS_SET = bool(API_WALLET and PRIVATE_KEY)
 
 # Default behavior
 DEFAULT_TIF       = os.getenv("HL_DEFAULT_TIF", "IOC").upper()           # IOC/GTC
 DEFAULT_SLIPPAGE  = float(os.getenv("HL_DEFAULT_SLIPPAGE", "0.02"))      # 2%
 
-# Optional allow-list of bases you actually want to trade (post-normalization).
-# Leave empty to allow anything HL lists.
-ALLOWED_SYMBOLS = {
-    # Example allow-list (bases only, left→right as requested previously)
-    # "BTC","ETH","SOL","LINK","BNB","AVAX","DOGE","TAO","TON","UNI",
-    # "NEAR","SUI","PAXG","STBL","HYPE","ZORA","ETHFI","MNT","CRV","AIXBT"
-}
+# Per-stage deadlines (seconds) for exchange calls made while handling an alert
+PRICE_TIMEOUT     = float(os.getenv("HL_PRICE_TIMEOUT", "2"))
+ORDER_TIMEOUT     = float(os.getenv("HL_ORDER_TIMEOUT", "8"))
+
+# On-disk markets snapshot so cold starts skip the load_markets fetch. Off unless set;
+# point it into a directory only this app's user can write (markets carry the asset
+# ids that get signed into orders), e.g. /var/lib/tradingview-hl/markets.json. The
+# file records NETWORK and the ccxt version and is ignored if either differs.
+MARKETS_CACHE     = os.getenv("HL_MARKETS_CACHE", "")
+MARKETS_CACHE_TTL = float(os.getenv("HL_MARKETS_CACHE_TTL", "3600"))  # seconds
+
+# How long (seconds) /health reuses the last fetched USDC balance
+BALANCE_TTL       = float(os.getenv("HL_BALANCE_TTL", "5"))
+
+# Always include sizing/order details in webhook replies (otherwise only with ?debug=1)
+DEBUG             = os.getenv("HL_DEBUG", "false").lower() == "true"
+
+# Identical alerts (same JSON body) within this many seconds are treated as duplicates
+DEDUP_TTL         = float(os.getenv("HL_DEDUP_TTL", "2"))
+
+# Max exchange calls in flight per process (thread pool + HTTP connection pool size)
+CCXT_WORKERS      = int(os.getenv("HL_CCXT_WORKERS", "16"))
+
+# How long (seconds) a fetched price is reused; short, since it's the order's slippage reference
+PRICE_TTL         = float(os.getenv("HL_PRICE_TTL", "0.5"))
+
+# Optional allow-list of bases you actually want to trade (post-normalization),
+# comma-separated. Leave empty to allow anything HL lists. Example:
+# HL_ALLOWED_BASES=BTC,ETH,SOL,LINK,BNB,AVAX,DOGE,TAO,TON,UNI,NEAR,SUI,PAXG,STBL,HYPE,ZORA,ETHFI,MNT,CRV,AIXBT
+ALLOWED_SYMBOLS = {b.strip().upper() for b in os.getenv("HL_ALLOWED_BASES", "").split(",") if b.strip()}
 
 # ── ccxt exchange singleton ──────────────────────────────────────────────────────
 _ex = None
 
+@functools.lru_cache(maxsize=4)
+def _signing_key(secret_hex: str) -> eth_keys.PrivateKey:
+    return eth_keys.PrivateKey(bytes.fromhex(secret_hex))
+
+class _Hyperliquid(ccxt.hyperliquid):
+    """
+    ccxt.hyperliquid, but orders are signed with a secp256k1 key parsed once.
+    ccxt's sign_hash rebuilds a pure-Python ecdsa SigningKey on every order;
+    eth_keys (from eth-account) yields the same RFC 6979, low-s signature, and
+    runs on libsecp256k1 when coincurve is installed.
+    """
+    def sign_hash(self, hash, privateKey):
+        sig = _signing_key(privateKey[-64:]).sign_msg_hash(bytes.fromhex(hash[-64:]))
+        return {
+            "r": f"0x{sig.r:064x}",
+            "s": f"0x{sig.s:064x}",
+            "v": 27 + sig.v,
+        }
+
+    # Every signed action uses self.milliseconds() as its nonce, and Hyperliquid
+    # rejects a reused nonce. Within this process it's strictly increasing; across
+    # gunicorn workers (same API wallet) each one only issues values in its own
+    # residue class, slot mod stride (see set_nonce_slot), so they can't collide.
+    _nonce_lock = threading.Lock()
+    _last_ms = 0
+
+    def milliseconds(self):
+        with self._nonce_lock:
+            n = max(self._last_ms + 1, time.time_ns() // 1_000_000)
+            n += (_nonce_slot - n) % _nonce_stride  # next value in this process's class
+            self._last_ms = n
+            return n
+
+# This process's nonce class (see _Hyperliquid.milliseconds): single process is
+# slot 0 of 1; gunicorn_conf assigns each live worker a distinct slot.
+_nonce_slot   = int(os.getenv("HL_NONCE_SLOT", "0"))
+_nonce_stride = int(os.getenv("HL_NONCE_STRIDE", "1"))
+
+def set_nonce_slot(slot: int, stride: int) -> None:
+    """For an app already imported before fork (gunicorn preload_app)."""
+    global _nonce_slot, _nonce_stride
+    _nonce_slot, _nonce_stride = slot, stride
+
+# Uppercased base -> ccxt symbol of its USDC-settled perp; rebuilt when markets load
+_perp_by_base: Dict[str, str] = {}
+# Slim /markets rows, also rebuilt when markets load: every row, rows per uppercased
+# base, and per-symbol detail rows (slim row + limits) for ?symbol=
+_market_rows: List[Dict[str, Any]] = []
+_market_rows_by_base: Dict[str, List[Dict[str, Any]]] = {}
+_market_detail: Dict[str, Dict[str, Any]] = {}
+# Serialized /markets bodies per (filter, value), filled on first hit; reset on market load
+_markets_body: Dict[Tuple[str, str], bytes] = {}
+
 def ex() -> ccxt.Exchange:
-    global _ex
+    global _ex, _perp_by_base, _market_rows, _market_rows_by_base, _market_detail, _markets_body
     if _ex is not None:
         return _ex
 
@@ -48,7 +189,18 @@ def ex() -> ccxt.Exchange:
             "defaultSlippage": DEFAULT_SLIPPAGE,  # market order tolerance
         },
     }
-    hl = ccxt.hyperliquid(opts)
+    hl = _Hyperliquid(opts)
+
+    # ccxt (sync) sends everything through hl.session; requests' default pool
+    # keeps 10 sockets per host, fewer than the calls _pool can have in flight.
+    # Size it to match so concurrent alerts reuse warm keep-alive TLS connections.
+    # Orders share this session with /info reads, so only failed connects are
+    # retried (nothing was sent, so an order can't go out twice); read errors and
+    # 5xx replies surface at once, and _call's stage deadline still bounds it all.
+    retry = Retry(total=2, connect=2, read=0, status=0, other=0, redirect=False,
+                  backoff_factor=0.05)
+    hl.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=CCXT_WORKERS,
+                                             max_retries=retry))
 
     if NETWORK == "testnet":
         try:
@@ -57,13 +209,124 @@ def ex() -> ccxt.Exchange:
         except Exception as e:
             log.warning("Could not enable sandbox: %s", e)
 
-    # Preload markets once for precision/limits
-    hl.load_markets(True)
-    log.info("✅ Markets loaded: %s symbols", len(hl.markets))
+    # Preload markets once for precision/limits (from a fresh snapshot if there is one)
+    if _load_markets_snapshot(hl):
+        log.info("✅ Markets loaded from %s: %s symbols", MARKETS_CACHE, len(hl.markets))
+    else:
+        hl.load_markets(True)
+        log.info("✅ Markets loaded: %s symbols", len(hl.markets))
+        _save_markets_snapshot(hl)
+    _meta_cache.clear()
+    _perp_by_base = {
+        m["base"].upper(): m["symbol"]
+        for m in hl.markets.values()
+        if m.get("settle") == "USDC" and m.get("base")
+    }
+    missing = sorted(b for b in ALLOWED_SYMBOLS if b not in _perp_by_base)
+    if missing:
+        # Catch allow-list typos at startup rather than on the first alert
+        log.warning("ALLOWED_SYMBOLS bases with no Hyperliquid perp: %s", ", ".join(missing))
+    _market_rows = [market_row(m) for m in hl.markets.values()]
+    by_base: Dict[str, List[Dict[str, Any]]] = {}
+    for row in _market_rows:
+        by_base.setdefault((row["base"] or "").upper(), []).append(row)
+    _market_rows_by_base = by_base
+    _market_detail = {
+        row["symbol"]: dict(row, limits=m.get("limits"))
+        for row, m in zip(_market_rows, hl.markets.values())
+    }
+    _markets_body = {}
 
     _ex = hl
     return _ex
 
+def _after_fork_in_child() -> None:
+    # A client built before fork (gunicorn preload) keeps its markets, but its
+    # pooled sockets belong to the parent; drop them so the child opens its own.
+    if _ex is not None:
+        _ex.session.close()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def _load_markets_snapshot(hl: ccxt.Exchange) -> bool:
+    """
+    Install markets from MARKETS_CACHE if it's younger than MARKETS_CACHE_TTL.
+    Only trusted if it's a regular file (not a symlink) owned by this user and
+    not writable by anyone else; checked on the open fd, so it can't be swapped.
+    Also rejected unless it was written for this NETWORK by this ccxt version:
+    testnet and mainnet asset ids differ, and they're signed into orders.
+    """
+    if not MARKETS_CACHE:
+        return False
+    try:
+        fd = os.open(MARKETS_CACHE, os.O_RDONLY | os.O_NOFOLLOW)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        log.warning("Ignoring markets snapshot %s: %s", MARKETS_CACHE, e)
+        return False
+    try:
+        with os.fdopen(fd, "rb") as f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o022:
+                log.warning("Ignoring markets snapshot %s: not a private file owned by uid %s",
+                            MARKETS_CACHE, os.geteuid())
+                return False
+            if time.time() - st.st_mtime > MARKETS_CACHE_TTL:
+                return False
+            snap = orjson.loads(f.read())
+        if snap.get("network") != NETWORK or snap.get("ccxt") != ccxt.__version__:
+            log.warning("Ignoring markets snapshot %s: written for network=%s ccxt=%s",
+                        MARKETS_CACHE, snap.get("network"), snap.get("ccxt"))
+            return False
+        hl.set_markets(snap["markets"], snap.get("currencies"))
+        return True
+    except Exception as e:
+        log.warning("Ignoring markets snapshot %s: %s", MARKETS_CACHE, e)
+        return False
+
+def _save_markets_snapshot(hl: ccxt.Exchange) -> None:
+    if not MARKETS_CACHE:
+        return
+    # Write a fresh 0600 temp file (mkstemp: unpredictable name, O_EXCL) next to
+    # the target, then rename, so concurrent workers never read a partial file
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(MARKETS_CACHE)),
+                                   prefix=os.path.basename(MARKETS_CACHE) + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({"network": NETWORK, "ccxt": ccxt.__version__,
+                                  "markets": list(hl.markets.values()), "currencies": hl.currencies},
+                                 default=_json_default, option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp, MARKETS_CACHE)
+    except Exception as e:
+        log.warning("Could not write markets snapshot %s: %s", MARKETS_CACHE, e)
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+# ── Bounded exchange calls ──────────────────────────────────────────────────────
+# A hung Hyperliquid endpoint must not pin the request thread for ccxt's full
+# socket timeout; run calls on a small pool and stop waiting at the deadline.
+_pool = ThreadPoolExecutor(max_workers=CCXT_WORKERS, thread_name_prefix="ccxt")
+
+def _call(stage: str, timeout: float, fn, *args, **kwargs):
+    """Run fn on the pool; raise TimeoutError naming the stage past `timeout` seconds."""
+    return _wait(stage, timeout, _pool.submit(fn, *args, **kwargs))
+
+class _NotSent(TimeoutError):
+    """Timed out while still queued for the pool; the call never ran."""
+
+def _wait(stage: str, timeout: float, fut: Future):
+    try:
+        return fut.result(timeout=timeout)
+    except TimeoutError:
+        if fut.cancel():
+            raise _NotSent(f"{stage} not sent: still queued after {timeout:g}s") from None
+        raise TimeoutError(f"{stage} timed out after {timeout:g}s") from None
+
 # ── TradingView symbol → Hyperliquid base normalization ──────────────────────────
 
 EXCEPT_BASE_MAP = {
@@ -74,25 +337,31 @@ EXCEPT_BASE_MAP = {
     # Add more exceptional mappings here if you encounter them
 }
 
+# Perp markers stripped first, then quote tails; longest-first so USDT/USDC win over USD
+_PERP_TAILS = (".P", "-PERP", "PERP")
+_QUOTE_TAILS = ("USDT", "USDC", "USD")
+
+@functools.lru_cache(maxsize=256)
 def _tv_to_base(sym: str) -> str:
     """
     Convert a TradingView ticker (e.g., BINANCE:BTCUSDT.P) into HL 'base' (e.g., BTC).
-    Handles suffixes like '.P', and common quote tails ('USD','USDT').
+    Handles perp suffixes ('.P', '-PERP', 'PERP'), and common quote tails ('USD','USDT','USDC').
     Applies an exception map for odd cases (XPL, OG, etc.).
     """
     s = (sym or "").upper().strip()
-    if ":" in s:
-        s = s.split(":")[-1]  # drop exchange prefix if present
+    s = s.rpartition(":")[2]  # drop exchange prefix if present
 
     if s in EXCEPT_BASE_MAP:
         return EXCEPT_BASE_MAP[s]
 
-    # strip paper/perp suffix '.P' used by some feeds
-    if s.endswith(".P"):
-        s = s[:-2]
+    # strip perp suffixes used by some feeds ('.P', '-PERP', 'PERP')
+    for tail in _PERP_TAILS:
+        if s.endswith(tail):
+            s = s[: -len(tail)]
+            break
 
     # strip common quote suffixes
-    for tail in ("USDT", "USD"):
+    for tail in _QUOTE_TAILS:
         if s.endswith(tail):
             s = s[: -len(tail)]
             break
@@ -100,36 +369,82 @@ def _tv_to_base(sym: str) -> str:
     # If it's already just a base (BTC/ETH/SOL/etc), it falls through unchanged
     return s
 
-def symbol_to_hl(user_symbol: str) -> str:
+def resolve_symbol(user_symbol: str) -> Optional[str]:
     """
-    Map user/TV symbol to ccxt Hyperliquid market symbol.
+    Map user/TV symbol to the listed HL perp via the load-time index.
     e.g. 'BTCUSD'/'BTCUSDT'/'BTCUSDT.P'/'BTC' -> 'BTC/USDC:USDC'
-         'TRUMPUSDT.P' -> 'TRUMP/USDC:USDC'
-         'XPLUSDT.P'   -> 'XPL/USDC:USDC'
+         'XPLUSDT.P' -> 'XPL/USDC:USDC'
+    Returns None if Hyperliquid doesn't list that base (no ccxt probe needed).
     """
-    base = _tv_to_base(user_symbol)
-    return f"{base}/USDC:USDC"
+    ex()  # builds the index on first use
+    return _perp_by_base.get(_tv_to_base(user_symbol))
 
 # ── Market helpers (amount steps / min sizes / prices) ───────────────────────────
 
+# symbol -> (time.monotonic() when fetched, price)
+_px_cache: Dict[str, Tuple[float, float]] = {}
+# One fetch per symbol at a time: concurrent misses wait for it, then hit the cache.
+_px_locks: Dict[str, threading.Lock] = {}
+_px_locks_guard = threading.Lock()
+
+def market_row(m: Dict[str, Any]) -> Dict[str, Any]:
+    """Slim projection of a ccxt market used by /markets."""
+    return {
+        "symbol": m["symbol"],
+        "base": m.get("base"),
+        "quote": m.get("quote"),
+        "settle": m.get("settle"),
+        "amountPrecision": (m.get("precision") or {}).get("amount") or m.get("amountPrecision"),
+        "pricePrecision": (m.get("precision") or {}).get("price") or m.get("pricePrecision"),
+    }
+
 def fetch_last(symbol: str) -> float:
-    """Get a usable last/close; fallback to mid from order book."""
+    """Last price for symbol, reused for PRICE_TTL seconds across callers."""
+    hit = _px_cache.get(symbol)
+    if hit is not None and time.monotonic() - hit[0] < PRICE_TTL:
+        return hit[1]
+    with _px_locks_guard:
+        lock = _px_locks.get(symbol)
+        if lock is None:
+            lock = _px_locks[symbol] = threading.Lock()
+    with lock:
+        hit = _px_cache.get(symbol)
+        if hit is not None and time.monotonic() - hit[0] < PRICE_TTL:
+            return hit[1]
+        px = _fetch_last_live(symbol)
+        _px_cache[symbol] = (time.monotonic(), px)
+        return px
+
+def _fetch_last_live(symbol: str) -> float:
+    """Get a usable last/close; else the ticker's bid/ask mid; fallback to mid from order book."""
     try:
-        t = ex().fetch_ticker(symbol)
+        t = _call("fetch_ticker", PRICE_TIMEOUT, ex().fetch_ticker, symbol)
         px = t.get("last") or t.get("close")
         if px:
             return float(px)
+        # The ticker often carries top-of-book already; skip the book request.
+        bid, ask = t.get("bid"), t.get("ask")
+        if bid and ask:
+            return float((bid + ask) / 2)
+    except TimeoutError:
+        raise  # exchange is stalling; don't spend another deadline on the book
     except Exception:
         pass
-    ob = ex().fetch_order_book(symbol, limit=5)
+    ob = _call("fetch_order_book", PRICE_TIMEOUT, ex().fetch_order_book, symbol, limit=5)
     bid = ob["bids"][0][0] if ob.get("bids") else None
     ask = ob["asks"][0][0] if ob.get("asks") else None
     if bid and ask:
         return float((bid + ask) / 2)
     raise RuntimeError(f"Could not fetch last price for {symbol}")
 
+# (amount_step, min_amount, price_step) per symbol; cleared whenever markets load
+_meta_cache: Dict[str, Tuple[float, float, float]] = {}
+
 def market_meta(symbol: str) -> Tuple[float, float, float]:
     """Return (amount_step, min_amount, price_step) with sensible fallbacks."""
+    cached = _meta_cache.get(symbol)
+    if cached is not None:
+        return cached
     m = ex().market(symbol)
     amount_step = (
         (m.get("precision") or {}).get("amount")
@@ -145,24 +460,43 @@ def market_meta(symbol: str) -> Tuple[float, float, float]:
         or m.get("pricePrecision")
         or 0.00000001
     )
-    return float(amount_step), float(min_amount), float(price_step)
+    meta = (float(amount_step), float(min_amount), float(price_step))
+    _meta_cache[symbol] = meta
+    return meta
+
+@functools.lru_cache(maxsize=None)
+def _step_decimal(step: float) -> Decimal:
+    # Steps come from a bounded set of markets; parse each one once
+    return Decimal(str(step))
 
 def _floor_to_step(value: float, step: float) -> float:
+    """
+    Floor to a multiple of step in decimal space, so 0.3 / 0.1 style
+    float drift can't push the result one step down (or off the grid).
+    """
     if step <= 0:
         return value
-    return math.floor(value / step) * step
+    d_step = _step_decimal(step)
+    return float((Decimal(str(value)) // d_step) * d_step)
 
-def clamp_amount(symbol: str, raw_amount: float) -> Tuple[float, Dict[str, Any]]:
+def clamp_amount(symbol: str, raw_amount: float,
+                 meta: Optional[Tuple[float, float, float]] = None,
+                 collect_debug: bool = True) -> Tuple[float, Optional[Dict[str, Any]]]:
     """
     Floors to symbol amount step, enforces min size, never returns 0 if trade is feasible.
+    The floored value is already on the step grid, so no amount_to_precision pass.
+    Pass `meta` if the caller already has market_meta(symbol).
+    With collect_debug=False the debug dict is skipped and None is returned in its place.
     """
-    amount_step, min_amount, _ = market_meta(symbol)
+    amount_step, min_amount, _ = meta or market_meta(symbol)
     floored = _floor_to_step(raw_amount, amount_step)
     if floored <= 0:
         floored = amount_step
     if floored < min_amount:
         floored = min_amount
-    final_amt = float(ex().amount_to_precision(symbol, floored))
+    final_amt = floored
+    if not collect_debug:
+        return final_amt, None
     return final_amt, {
         "raw_amount": raw_amount,
         "amount_step": amount_step,
@@ -171,13 +505,18 @@ def clamp_amount(symbol: str, raw_amount: float) -> Tuple[float, Dict[str, Any]]
         "final_amt": final_amt,
     }
 
-def compute_amount_from_notional(symbol: str, notional: float) -> Tuple[float, Dict[str, Any]]:
-    px = fetch_last(symbol)
+def compute_amount_from_notional(symbol: str, notional: float,
+                                 px: Optional[float] = None,
+                                 collect_debug: bool = True) -> Tuple[float, Optional[Dict[str, Any]]]:
+    meta = market_meta(symbol)
+    if px is None:
+        px = fetch_last(symbol)
     raw = float(notional) / float(px)
-    amt, dbg = clamp_amount(symbol, raw)
-    dbg.update({"notional": notional, "last_price": px})
+    amt, dbg = clamp_amount(symbol, raw, meta, collect_debug)
+    if dbg is not None:
+        dbg.update({"notional": notional, "last_price": px})
     # sanity check against min notional
-    _, min_amt, _ = market_meta(symbol)
+    min_amt = meta[1]
     min_notional = min_amt * px
     if amt <= 0 or notional < min_notional:
         raise ValueError(
@@ -187,21 +526,184 @@ def compute_amount_from_notional(symbol: str, notional: float) -> Tuple[float, D
 
 # ── Order placement: simple "fire-and-let-HL-flip" ──────────────────────────────
 
-def place_market(symbol: str, side: str, amount: float, tif: Optional[str] = None):
+def place_market(symbol: str, side: str, amount: float, tif: Optional[str] = None,
+                 ref_price: Optional[float] = None, lock: Optional[threading.Lock] = None):
     """
     Submit a MARKET order and let Hyperliquid handle flips (auto-close + reverse).
     We pass a reference price + slippage so ccxt/HL computes bounds.
+    Pass `ref_price` to reuse a price the caller already fetched.
+    `lock`, if given, is one the caller holds; it's released when create_order
+    actually finishes, not when we stop waiting, so an order still in flight
+    after ORDER_TIMEOUT keeps the next one for this symbol out.
+    """
+    try:
+        ref = ref_price if ref_price is not None else fetch_last(symbol)
+        params = {"slippage": DEFAULT_SLIPPAGE}
+        if tif:
+            params["tif"] = tif
+        # No manual close/reopen logic — HL flips automatically if side changes.
+        fut = _pool.submit(ex().create_order, symbol, "market", side, float(amount), ref, params)
+    except BaseException:
+        if lock is not None:
+            lock.release()
+        raise
+    if lock is not None:
+        fut.add_done_callback(lambda _: lock.release())
+    return _wait("create_order", ORDER_TIMEOUT, fut)
+
+# ── Cached balance (for /health) ────────────────────────────────────────────────
+# Liveness probes hit /health every few seconds; don't turn each into a signed
+# fetch_balance round-trip.
+_bal_cache: Tuple[float, Optional[float]] = (0.0, None)   # (time.monotonic(), free USDC)
+_bal_lock = threading.Lock()
+
+def cached_balance() -> Optional[float]:
     """
-    ref = fetch_last(symbol)
-    params = {"slippage": DEFAULT_SLIPPAGE}
-    if tif:
-        params["tif"] = tif
-    # No manual close/reopen logic — HL flips automatically if side changes.
-    return ex().create_order(symbol, "market", side, float(amount), ref, params)
+    Free USDC, refreshed at most once per BALANCE_TTL. Concurrent probes wait on
+    one fetch instead of each sending their own; if it fails, the last known
+    balance (None if there never was one) is kept for another BALANCE_TTL, so a
+    down exchange isn't retried on every probe. None without an API wallet.
+    """
+    global _bal_cache
+    if not API_WALLET:
+        return None
+    ts, bal = _bal_cache
+    if ts and time.monotonic() - ts < BALANCE_TTL:
+        return bal
+    with _bal_lock:
+        ts, bal = _bal_cache
+        if ts and time.monotonic() - ts < BALANCE_TTL:
+            return bal  # refreshed by the probe we waited on
+        try:
+            fresh = _call("fetch_balance", PRICE_TIMEOUT, ex().fetch_balance).get("USDC", {}).get("free")
+        except Exception as e:
+            log.warning("Balance refresh failed: %s", e)
+            _bal_cache = (time.monotonic(), bal)  # back off before retrying
+            return bal
+        _bal_cache = (time.monotonic(), fresh)
+        return fresh
+
+# ── Per-symbol serialization ────────────────────────────────────────────────────
+# Orders for the same market never overlap: each holds its symbol's lock until
+# create_order has returned (see place_market), even past our own deadline.
+# Which of two waiting alerts goes first is not defined (threading.Lock isn't
+# FIFO), so this stops racing orders, not reordering.
+_symbol_locks: Dict[str, threading.Lock] = {}
+_symbol_locks_guard = threading.Lock()
+
+def symbol_lock(symbol: str) -> threading.Lock:
+    with _symbol_locks_guard:
+        lock = _symbol_locks.get(symbol)
+        if lock is None:
+            lock = _symbol_locks[symbol] = threading.Lock()
+        return lock
+
+# ── Alert payload ───────────────────────────────────────────────────────────────
+
+def _opt_number(payload: Dict[str, Any], field: str) -> Optional[float]:
+    v = payload.get(field)
+    if v is None:
+        return None
+    if isinstance(v, bool):  # float(True) == 1.0
+        raise ValueError(f"'{field}' must be a number")
+    try:
+        x = float(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a number") from None
+    # NaN/inf would reach the order as-is, and 0/negatives would be bumped up to
+    # the market minimum by clamp_amount; neither is a real size.
+    if not math.isfinite(x) or x <= 0:
+        raise ValueError(f"'{field}' must be a positive number")
+    return x
+
+def parse_alert(payload: Any) -> Tuple[str, str, str, Optional[float], Optional[float]]:
+    """
+    Validate and coerce a TradingView alert body in one pass, up front.
+    Returns (symbol, action, tif, quantity, notional); raises ValueError (-> 400).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Body must be a JSON object")
+
+    symbol = payload.get("symbol")
+    if not isinstance(symbol, str) or not symbol.strip():
+        raise ValueError("Missing symbol")
+
+    action = payload.get("action")
+    action = action.lower().strip() if isinstance(action, str) else ""
+    if action not in ("buy", "sell"):
+        raise ValueError("action must be 'buy' or 'sell'")
+
+    tif = payload.get("tif") or DEFAULT_TIF
+    if not isinstance(tif, str):
+        raise ValueError("'tif' must be a string")
+
+    qty = _opt_number(payload, "quantity")
+    notional = _opt_number(payload, "notional")
+    if qty is None and notional is None:
+        raise ValueError("Provide either 'quantity' or 'notional'")
+
+    return symbol.strip(), action, tif.upper(), qty, notional
+
+# ── Duplicate-alert suppression ─────────────────────────────────────────────────
+# TradingView sometimes delivers the same alert twice within milliseconds; each
+# copy would otherwise place its own order.
+_recent_alerts: Dict[bytes, float] = {}   # alert key -> time.monotonic() expiry
+_recent_alerts_lock = threading.Lock()
+
+def alert_key(payload: Dict[str, Any]) -> bytes:
+    return hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+
+def claim_alert(key: bytes) -> bool:
+    """Mark an alert as in flight; False if an identical one was claimed within DEDUP_TTL."""
+    now = time.monotonic()
+    with _recent_alerts_lock:
+        for k in [k for k, exp in _recent_alerts.items() if exp <= now]:
+            del _recent_alerts[k]
+        if key in _recent_alerts:
+            return False
+        _recent_alerts[key] = now + DEDUP_TTL
+        return True
+
+def release_alert(key: bytes) -> None:
+    with _recent_alerts_lock:
+        _recent_alerts.pop(key, None)
 
 # ── Flask app ───────────────────────────────────────────────────────────────────
 
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """
+    app.json backed by orjson: jsonify() responses and request.get_json()
+    both go through the C encoder/decoder instead of stdlib json.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=_json_default, option=self.option).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Hand orjson's bytes straight to the response; no str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_json_default, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# TradingView alert bodies are a few hundred bytes; anything bigger gets a 413
+app.config["MAX_CONTENT_LENGTH"] = 64 * 1024
+
+@app.errorhandler(413)
+def too_large(_e):
+    # Same JSON error shape as the webhook's own errors, not Flask's HTML page
+    return jsonify({"status": "error",
+                    "message": f"Body larger than {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
 
 @app.get("/")
 def root():
@@ -226,16 +728,11 @@ def whoami():
 
 @app.get("/health")
 def health():
-    ok_creds = bool(API_WALLET and PRIVATE_KEY)
-    bal = None
-    try:
-        bal = ex().fetch_balance().get("USDC", {}).get("free")
-    except Exception:
-        pass
+    bal = cached_balance()
     return jsonify({
         "status": "healthy",
         "network": NETWORK,
-        "credentials_set": ok_creds,
+        "credentials_set": CREDENTIALS_SET,
         "trading": "active",
         "balance": bal
     })
@@ -244,30 +741,22 @@ def health():
 def markets():
     base = request.args.get("base")
     sym = request.args.get("symbol")
-    data = []
-    if sym:
-        m = ex().market(sym)
-        data.append({
-            "symbol": m["symbol"],
-            "base": m.get("base"),
-            "quote": m.get("quote"),
-            "settle": m.get("settle"),
-            "amountPrecision": (m.get("precision") or {}).get("amount") or m.get("amountPrecision"),
-            "pricePrecision": (m.get("precision") or {}).get("price") or m.get("pricePrecision"),
-            "limits": m.get("limits"),
-        })
-    else:
-        for m in ex().markets.values():
-            if (not base) or (m.get("base") == base.upper()):
-                data.append({
-                    "symbol": m["symbol"],
-                    "base": m.get("base"),
-                    "quote": m.get("quote"),
-                    "settle": m.get("settle"),
-                    "amountPrecision": (m.get("precision") or {}).get("amount") or m.get("amountPrecision"),
-                    "pricePrecision": (m.get("precision") or {}).get("price") or m.get("pricePrecision"),
-                })
-    return jsonify({"count": len(data), "markets": data})
+    ex()  # rows are built at market load
+    key = ("symbol", sym) if sym else ("base", base.upper() if base else "")
+    body = _markets_body.get(key)
+    if body is None:
+        if sym:
+            row = _market_detail.get(sym)
+            if row is None:
+                return jsonify({"status": "error", "message": f"Unknown market '{sym}'"}), 404
+            data = [row]
+        else:
+            data = _market_rows_by_base.get(base.upper(), []) if base else _market_rows
+        body = orjson.dumps({"count": len(data), "markets": data},
+                            default=_json_default, option=OrjsonProvider.option)
+        if data:
+            _markets_body[key] = body  # only real markets, so junk ?base= values can't grow it
+    return app.response_class(body, mimetype="application/json")
 
 @app.post("/webhook/tradingview")
 def tradingview():
@@ -280,60 +769,101 @@ def tradingview():
       "notional": 50,                                                                   # use one
       "tif":      "IOC" | "GTC"                                                         # optional (defaults to IOC)
     }
+    Add ?debug=1 to the URL to get the full ccxt order and sizing details back.
     """
+    if not CREDENTIALS_SET:
+        # Fail before any market/price round-trip; ccxt would reject at signing.
+        return jsonify({"status": "error",
+                        "message": "HL_API_WALLET / HL_PRIVATE_KEY not configured"}), 503
+
+    # Read once, uncached (nothing else needs the body); over MAX_CONTENT_LENGTH
+    # this raises 413 itself, so keep it outside the catch-all below.
+    raw = request.get_data(cache=False)
     try:
-        payload = request.get_json(force=True, silent=False) or {}
+        # Parse straight from the body bytes (any Content-Type, like force=True)
+        try:
+            payload = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return jsonify({"status": "error", "message": "Body must be valid JSON"}), 400
         log.info("Received alert: %s", payload)
 
-        raw_symbol = (payload.get("symbol") or "").strip()
-        if not raw_symbol:
-            return jsonify({"status": "error", "message": "Missing symbol"}), 400
-
-        action = (payload.get("action") or "").lower().strip()
-        if action not in ("buy", "sell"):
-            return jsonify({"status": "error", "message": "action must be 'buy' or 'sell'"}), 400
-
-        hl_symbol = symbol_to_hl(raw_symbol)
-        base = hl_symbol.split("/")[0]
-        log.info("Resolved symbol '%s' -> '%s'", raw_symbol, hl_symbol)
-
-        # Optional allow-list check (skip if list is empty)
-        if ALLOWED_SYMBOLS and base not in ALLOWED_SYMBOLS:
-            return jsonify({"status": "error",
-                            "message": f"Base '{base}' not in ALLOWED_SYMBOLS"}), 400
-
-        # Ensure the market exists
-        ex().market(hl_symbol)
-
-        tif = (payload.get("tif") or DEFAULT_TIF).upper()
-        qty = payload.get("quantity")
-        notional = payload.get("notional")
-
-        debug_info = {}
-        if qty is not None:
-            amt, dbg = clamp_amount(hl_symbol, float(qty))
-            debug_info["from_quantity"] = dbg
-        elif notional is not None:
-            amt, dbg = compute_amount_from_notional(hl_symbol, float(notional))
-            debug_info["from_notional"] = dbg
-        else:
-            return jsonify({"status": "error",
-                            "message": "Provide either 'quantity' or 'notional'"}), 400
+        raw_symbol, action, tif, qty, notional = parse_alert(payload)
+
+        # Drop a resent alert before any price round-trip or sizing work
+        key = alert_key(payload)
+        if not claim_alert(key):
+            log.info("Duplicate alert within %ss, skipped: %s", DEDUP_TTL, payload)
+            return jsonify({"status": "duplicate", "symbol": resolve_symbol(raw_symbol) or raw_symbol,
+                            "side": action}), 202
 
-        order = place_market(hl_symbol, action, amt, tif)
+        try:
+            base = _tv_to_base(raw_symbol)
+
+            # Optional allow-list check (skip if list is empty)
+            if ALLOWED_SYMBOLS and base not in ALLOWED_SYMBOLS:
+                raise ValueError(f"Base '{base}' not in ALLOWED_SYMBOLS")
+
+            # Index membership is the existence check
+            hl_symbol = resolve_symbol(raw_symbol)
+            if hl_symbol is None:
+                raise ValueError(f"No Hyperliquid market for '{raw_symbol}' (base '{base}')")
+            log.info("Resolved symbol '%s' -> '%s'", raw_symbol, hl_symbol)
+
+            # Full ccxt order + sizing breakdown only on request (?debug=1 or HL_DEBUG);
+            # TradingView ignores the body, so keep the default reply small.
+            want_debug = DEBUG or request.args.get("debug") == "1"
+
+            # Fetched once here (not inside place_market), so a TimeoutError from
+            # place_market below can only mean create_order itself.
+            px = fetch_last(hl_symbol)
+            debug_info = {}
+            if qty is not None:
+                amt, dbg = clamp_amount(hl_symbol, qty, collect_debug=want_debug)
+                debug_info["from_quantity"] = dbg
+            else:
+                amt, dbg = compute_amount_from_notional(hl_symbol, notional, px,
+                                                        collect_debug=want_debug)
+                debug_info["from_notional"] = dbg
+
+            lock = symbol_lock(hl_symbol)
+            if not lock.acquire(timeout=ORDER_TIMEOUT):
+                raise TimeoutError(f"waited {ORDER_TIMEOUT:g}s on an earlier {hl_symbol} order")
+        except Exception:
+            release_alert(key)  # nothing was placed; let a resend through
+            raise
 
-        return jsonify({
+        try:
+            order = place_market(hl_symbol, action, amt, tif, ref_price=px, lock=lock)
+        except _NotSent:
+            release_alert(key)  # cancelled before it ran; let a resend through
+            raise
+        except TimeoutError:
+            raise  # the order may still have landed; keep the claim so a resend is dropped
+        except Exception:
+            release_alert(key)  # nothing was placed; let a resend through
+            raise
+
+        resp = {
             "status": "ok",
             "symbol": hl_symbol,
             "side": action,
             "tif": tif,
             "amount": float(amt),
-            "amount_debug": debug_info,
-            "order": order
-        })
+            "id": order.get("id"),
+        }
+        if want_debug:
+            resp["amount_debug"] = debug_info
+            resp["order"] = order
+        return jsonify(resp)
 
     except ValueError as ve:
         return jsonify({"status": "error", "message": str(ve)}), 400
+    except TimeoutError as te:
+        # 504 so TradingView sees a gateway timeout; a timed-out create_order
+        # may still have reached the exchange, so the message says which stage
+        # (and "not sent" when it never left our queue).
+        log.warning("Exchange stage timeout: %s", te)
+        return jsonify({"status": "error", "message": f"hyperliquid {te}"}), 504
     except ccxt.BaseError as ce:
         log.exception("Exchange error")
         return jsonify({"status": "error", "message": f"hyperliquid {str(ce)}"}), 400